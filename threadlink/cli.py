@@ -1,16 +1,21 @@
 import argparse
+import contextlib
+import functools
+import itertools
 import json
-import uuid
-import datetime
-import re 
-import urllib.parse
+import re
 import os
+import sys
+import time
 from pathlib import Path
 
+from . import journal, serialization
+
 # Security constants
 MAX_SUMMARY_LENGTH = 500
 MAX_TAG_LENGTH = 100
 MAX_FILE_PATH_LENGTH = 1000
+MAX_JOURNAL_SIZE = 1024 * 1024  # Compact the journal into a snapshot beyond this size
 ALLOWED_URL_SCHEMES = ['http', 'https']
 ALLOWED_DOMAINS = [
     'chat.openai.com',
@@ -20,16 +25,18 @@ ALLOWED_DOMAINS = [
     'poe.com'
 ]
 
+# Drops null bytes and control characters (except tab/newline/CR) and escapes
+# backslashes and quotes, so sanitize_string is a single str.translate call
+_SANITIZE_TABLE = dict.fromkeys((c for c in range(32) if c not in (9, 10, 13)), None)
+_SANITIZE_TABLE.update({ord('\\'): '\\\\', ord('"'): '\\"'})
+
 def sanitize_string(text, max_length=None):
     """Sanitize user input to prevent injection attacks"""
     if not isinstance(text, str):
         raise ValueError("Input must be a string")
     
-    # Remove null bytes and control characters
-    sanitized = ''.join(char for char in text if ord(char) >= 32 or char in '\t\n\r')
-    
-    # Remove potential JSON escape sequences
-    sanitized = sanitized.replace('\\', '\\\\').replace('"', '\\"')
+    # Remove control characters and escape JSON metacharacters in one pass
+    sanitized = text.translate(_SANITIZE_TABLE)
     
     # Apply length limit
     if max_length and len(sanitized) > max_length:
@@ -42,8 +49,10 @@ def validate_url(url):
     if not url:
         return ""
     
+    from urllib.parse import urlparse, urlunparse
+    
     try:
-        parsed = urllib.parse.urlparse(url)
+        parsed = urlparse(url)
         
         # Check scheme
         if parsed.scheme not in ALLOWED_URL_SCHEMES:
@@ -55,44 +64,55 @@ def validate_url(url):
         #     raise ValueError(f"URL domain must be one of: {', '.join(ALLOWED_DOMAINS)}")
         
         # Reconstruct URL to normalize it
-        return urllib.parse.urlunparse(parsed)
+        return urlunparse(parsed)
     
     except Exception as e:
         raise ValueError(f"Invalid URL format: {e}")
 
-def validate_file_path(file_path):
-    """Validate and sanitize file paths to prevent path traversal"""
+# The home directory is fixed for the life of the process; the cwd is not
+_HOME = str(Path.home())
+
+def _is_within(path, directory):
+    """Return True if path is directory itself or lies underneath it"""
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+def validate_file_path(file_path, check_exists=False):
+    """Validate and sanitize file paths to prevent path traversal
+    
+    Returns (resolved_path, stat_result); stat_result is only looked up when
+    check_exists is set and is None if the file does not exist.
+    """
     if not file_path:
         raise ValueError("File path cannot be empty")
     
     if len(file_path) > MAX_FILE_PATH_LENGTH:
         raise ValueError(f"File path too long (max {MAX_FILE_PATH_LENGTH} characters)")
     
-    # Convert to Path object and resolve
+    # Expand and resolve in one pass over the path components
     try:
-        path = Path(file_path).expanduser().resolve()
+        path_str = os.path.realpath(os.path.expanduser(file_path))
     except Exception as e:
         raise ValueError(f"Invalid file path: {e}")
     
     # Check for path traversal attempts
-    path_str = str(path)
     if '..' in file_path or path_str.startswith('/etc') or path_str.startswith('/var') or path_str.startswith('/usr'):
         print(f"⚠️  Warning: Path '{file_path}' may access system directories")
     
     # Additional security: ensure path is under user's home directory or current working directory
-    user_home = Path.home()
-    current_dir = Path.cwd()
+    if not _is_within(path_str, _HOME) and not _is_within(path_str, os.getcwd()):
+        print(f"⚠️  Warning: File '{path_str}' is outside your home directory and current directory")
     
-    try:
-        # Check if path is under home or current directory
-        path.relative_to(user_home)
-    except ValueError:
+    stat_result = None
+    if check_exists:
         try:
-            path.relative_to(current_dir)
-        except ValueError:
-            print(f"⚠️  Warning: File '{path}' is outside your home directory and current directory")
+            stat_result = os.stat(path_str)
+        except OSError:
+            pass
     
-    return str(path)
+    return path_str, stat_result
+
+# Characters that are never allowed in a thread tag
+_INVALID_TAG_CHARS_RE = re.compile('[<>"\'&\n\r\x00]')
 
 def validate_tag(tag):
     """Validate thread tag/ID"""
@@ -103,47 +123,227 @@ def validate_tag(tag):
         raise ValueError(f"Tag too long (max {MAX_TAG_LENGTH} characters)")
     
     # Check for potentially dangerous characters
-    if any(char in tag for char in ['<', '>', '"', "'", '&', '\n', '\r', '\0']):
+    if _INVALID_TAG_CHARS_RE.search(tag):
         raise ValueError("Tag contains invalid characters")
     
     return sanitize_string(tag, MAX_TAG_LENGTH)
 
-def get_thread_index():
-    """Load or create the thread index with proper error handling"""
-    base_dir = Path.home() / ".threadlink"
-    index_file = base_dir / "thread_index.json"
+# Parsed thread index, reused while the snapshot and journal are unchanged on disk.
+# "head" holds the digest the next journal record chains onto.
+_INDEX_CACHE = {"key": None, "data": None, "head": journal.GENESIS}
+
+def _stat_key(path):
+    """Return (mtime_ns, size) for a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _index_cache_key(index_file):
+    """Fingerprint the on-disk state of the snapshot and its journal"""
+    return (str(index_file), _stat_key(index_file), _stat_key(get_journal_file(index_file)))
+
+def _update_index_cache(thread_index, index_file):
+    """Remember thread_index as the parsed form of what is now on disk"""
+    _INDEX_CACHE["key"] = _index_cache_key(index_file)
+    _INDEX_CACHE["data"] = thread_index
+
+def _loaded_key(thread_index):
+    """Return the on-disk fingerprint thread_index was loaded or last saved with
     
+    None means thread_index is not the cached state (for example a corrupted
+    snapshot that was read without repair), so no side index can be keyed on it.
+    """
+    return _INDEX_CACHE["key"] if _INDEX_CACHE["data"] is thread_index else None
+
+def get_journal_file(index_file):
+    """Return the journal path that accompanies an index snapshot"""
+    return index_file.with_suffix('.jsonl')
+
+def get_search_db(index_file):
+    """Return the path of the rebuildable full-text search database"""
+    return index_file.with_name('search.db')
+
+def get_file_index_db(index_file):
+    """Return the path of the rebuildable file path -> thread index"""
+    return index_file.with_name('file_index.db')
+
+def get_index_file():
+    """Return the thread index snapshot path without touching the filesystem"""
+    return Path.home() / ".threadlink" / "thread_index.json"
+
+def get_base_dir():
+    """Return the threadlink data directory, creating it if needed"""
+    base_dir = get_index_file().parent
     try:
         base_dir.mkdir(parents=True, exist_ok=True, mode=0o700)  # Secure permissions
     except Exception as e:
         raise RuntimeError(f"Failed to create threadlink directory: {e}")
+    return base_dir
+
+def _load_index(index_file, repair):
+    """Load the thread index snapshot and replay the journal on top of it
+    
+    A corrupted snapshot or journal is only moved aside when repair is set;
+    read-only loads leave it in place for the next write to back up. A
+    journal keeps the records before its first unreadable one.
+    """
+    # Skip the parse entirely when nothing changed since the last load
+    cache_key = _index_cache_key(index_file)
+    if _INDEX_CACHE["key"] == cache_key:
+        return _INDEX_CACHE["data"]
+    
+    # The cache key's stat results double as existence checks
+    _, snapshot_stat, journal_stat = cache_key
+    cacheable = True
     
-    if index_file.exists():
+    thread_index = {}
+    if snapshot_stat is not None:
         try:
-            with open(index_file, "r", encoding='utf-8') as f:
-                data = json.load(f)
-                # Validate loaded data structure
-                if not isinstance(data, dict):
-                    raise ValueError("Thread index must be a JSON object")
-                return data, index_file
+            data = serialization.load_file(index_file)
+            # Validate loaded data structure
+            if not isinstance(data, dict):
+                raise ValueError("Thread index must be a JSON object")
+            thread_index = data
+            
+            # Linked files are held as sets in memory for O(1) attach/detach
+            for thread_data in thread_index.values():
+                if isinstance(thread_data, dict) and isinstance(thread_data.get("linked_files"), list):
+                    thread_data["linked_files"] = set(thread_data["linked_files"])
         except (json.JSONDecodeError, ValueError) as e:
-            print(f"⚠️  Warning: Corrupted thread index file. Creating backup...")
-            backup_file = index_file.with_suffix('.json.backup')
-            index_file.rename(backup_file)
-            print(f"Backup saved as: {backup_file}")
-            return {}, index_file
+            if repair:
+                print(f"⚠️  Warning: Corrupted thread index file. Creating backup...")
+                backup_file = index_file.with_suffix('.json.backup')
+                index_file.rename(backup_file)
+                print(f"Backup saved as: {backup_file}")
+            else:
+                print(f"⚠️  Warning: Corrupted thread index file. It will be backed up on the next change.")
+                cacheable = False
         except Exception as e:
             raise RuntimeError(f"Failed to read thread index: {e}")
+    
+    head = journal.GENESIS
+    if journal_stat is not None:
+        journal_file = get_journal_file(index_file)
+        try:
+            head = journal.replay(journal_file, thread_index)
+        except ValueError as e:
+            # thread_index already holds every record before the unreadable one
+            if repair:
+                print(f"⚠️  Warning: Corrupted thread journal ({e}). Creating backup...")
+                # Snapshot the good records before moving the journal, so a crash in
+                # between only means replaying them again
+                save_index(thread_index, index_file)
+                backup_file = journal_file.with_suffix('.jsonl.backup')
+                journal_file.replace(backup_file)
+                print(f"Backup saved as: {backup_file}")
+                cache_key = _index_cache_key(index_file)  # The chain restarts at GENESIS
+            else:
+                print(f"⚠️  Warning: Corrupted thread journal ({e}). It will be backed up on the next change.")
+                cacheable = False
+        except Exception as e:
+            raise RuntimeError(f"Failed to read thread journal: {e}")
+    
+    if cacheable:
+        _INDEX_CACHE["key"] = cache_key
+        _INDEX_CACHE["data"] = thread_index
+        _INDEX_CACHE["head"] = head
+    return thread_index
+
+def load_readonly():
+    """Load the thread index for a command that never changes it
+    
+    The shared lock is held only while loading, so a compaction cannot swap
+    the snapshot and empty the journal halfway through the read. Nothing but
+    the lock file is created on disk; a missing index simply loads as empty.
+    """
+    index_file = get_index_file()
+    if not index_file.parent.is_dir():
+        return _load_index(index_file, repair=False), index_file
+    with _index_lock(index_file.parent, shared=True):
+        return _load_index(index_file, repair=False), index_file
+
+def load_for_write():
+    """Load the thread index ahead of a change
+    
+    Only called through _locked_index(), which has already created the data
+    directory while taking the lock.
+    """
+    index_file = get_index_file()
+    return _load_index(index_file, repair=True), index_file
+
+def _lock(fd, shared=False):
+    """Block until this process holds the index lock, shared by readers or exclusive"""
+    if os.name == "nt":
+        # msvcrt has no shared mode; readers hold it exclusively for the brief load.
+        # LK_LOCK gives up with EDEADLOCK after about ten seconds, so keep retrying.
+        import errno
+        import msvcrt
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError as e:
+                if e.errno != errno.EDEADLK:
+                    raise
     else:
-        return {}, index_file
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+def _unlock(fd):
+    """Release the index lock taken by _lock()"""
+    if os.name == "nt":
+        import msvcrt
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+@contextlib.contextmanager
+def _index_lock(base_dir, shared=False):
+    """Hold the advisory lock on base_dir/.lock for the duration of the block"""
+    try:
+        fd = os.open(base_dir / ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    except OSError as e:
+        raise RuntimeError(f"Failed to lock thread index: {e}")
+    try:
+        _lock(fd, shared)
+    except OSError as e:
+        os.close(fd)
+        raise RuntimeError(f"Failed to lock thread index: {e}")
+    
+    try:
+        yield
+    finally:
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+@contextlib.contextmanager
+def _locked_index():
+    """Load the thread index under an exclusive lock held for the whole block
+    
+    Every load-modify-record sequence runs inside this so that concurrent
+    invocations cannot act on stale state or compact away each other's changes.
+    """
+    with _index_lock(get_base_dir()):
+        yield load_for_write()
 
 def save_index(thread_index, index_file):
-    """Save the thread index with proper error handling and permissions"""
+    """Write a full snapshot of the thread index with proper error handling and permissions"""
     try:
         # Create temporary file first
         temp_file = index_file.with_suffix('.tmp')
-        with open(temp_file, "w", encoding='utf-8') as f:
-            json.dump(thread_index, f, indent=2, ensure_ascii=False)
+        # Snapshots hold protocol-form entries: date_created and linked_files lists
+        snapshot = {k: export_entry(v) if isinstance(v, dict) else v for k, v in thread_index.items()}
+        data = serialization.dumps(snapshot, indent=True) + b"\n"
+        with open(temp_file, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
         
         # Atomic rename
         temp_file.replace(index_file)
@@ -152,7 +352,50 @@ def save_index(thread_index, index_file):
         os.chmod(index_file, 0o600)
         
     except Exception as e:
+        _INDEX_CACHE["key"] = None
         raise RuntimeError(f"Failed to save thread index: {e}")
+    
+    _update_index_cache(thread_index, index_file)
+
+def compact_index(thread_index, index_file):
+    """Fold the journal into a fresh snapshot and start a new journal"""
+    save_index(thread_index, index_file)
+    try:
+        journal.truncate(get_journal_file(index_file))
+    except Exception as e:
+        raise RuntimeError(f"Failed to truncate thread journal: {e}")
+    _INDEX_CACHE["head"] = journal.GENESIS
+
+def record_changes(thread_index, index_file, changes):
+    """Apply (op, thread_id, fields) changes in memory and append them to the journal in one write"""
+    records = [{"op": op, "thread_id": thread_id, "fields": fields} for op, thread_id, fields in changes]
+    old_key = _index_cache_key(index_file)
+    try:
+        journal_size, _INDEX_CACHE["head"] = journal.append(
+            get_journal_file(index_file), records, _INDEX_CACHE["head"])
+    except Exception as e:
+        raise RuntimeError(f"Failed to save thread index: {e}")
+    
+    for record in records:
+        journal.apply(thread_index, record)
+    
+    if journal_size > MAX_JOURNAL_SIZE:
+        compact_index(thread_index, index_file)
+    
+    _update_index_cache(thread_index, index_file)
+    
+    # Writers keep the side indexes in step; readers only ever open them read-only
+    from . import file_index, search
+    for mirror_module, db_file in ((search, get_search_db(index_file)),
+                                   (file_index, get_file_index_db(index_file))):
+        mirror_module.record_changes(db_file, thread_index, old_key, _INDEX_CACHE["key"], changes)
+
+def record_change(thread_index, index_file, op, thread_id, **fields):
+    """Apply a single change in memory and append it to the journal"""
+    record_changes(thread_index, index_file, [(op, thread_id, fields)])
+
+# ASCII-only word pattern for slugs, matching the thread ID character set in PROTOCOL.md
+_SLUG_WORD_RE = re.compile(r'[A-Za-z0-9_]+')
 
 def slugify(text, max_words=3, max_chars=25):
     """Create a clean slug from text with security considerations"""
@@ -163,23 +406,72 @@ def slugify(text, max_words=3, max_chars=25):
     text = sanitize_string(text, 100)
     
     # Extract words (alphanumeric only for security)
-    words = re.findall(r'\w+', text.lower())
+    words = _SLUG_WORD_RE.findall(text.lower())
     if not words:
         return "unnamed"
     
     slug = "_".join(words[:max_words])
     return slug[:max_chars]
 
+def format_timestamp_ns(timestamp_ns):
+    """Format a time.time_ns() value as an ISO 8601 UTC timestamp"""
+    from datetime import datetime, timezone
+    
+    seconds, nanoseconds = divmod(timestamp_ns, 1_000_000_000)
+    moment = datetime.fromtimestamp(seconds, tz=timezone.utc)
+    return moment.replace(microsecond=nanoseconds // 1000).isoformat()
+
+def export_entry(entry):
+    """Return a thread entry in protocol form for output or a snapshot
+    
+    date_created is derived from created_ns and the in-memory linked_files set
+    becomes a sorted list.
+    """
+    exported = dict(entry)
+    if "created_ns" in exported:
+        exported["date_created"] = format_timestamp_ns(exported.pop("created_ns"))
+    if isinstance(exported.get("linked_files"), set):
+        exported["linked_files"] = sorted(exported["linked_files"])
+    return exported
+
+def cli_handler(func):
+    """Report validation and runtime errors from a subcommand handler as CLI messages"""
+    @functools.wraps(func)
+    def wrapper(args):
+        try:
+            return func(args)
+        except (ValueError, RuntimeError) as e:
+            print(f"❌ Error: {e}")
+        except Exception as e:
+            print(f"❌ Unexpected error: {e}")
+    return wrapper
+
+def write_json(obj):
+    """Write obj to stdout as JSON, indented only when a person is reading it"""
+    data = serialization.dumps(obj, indent=sys.stdout.isatty()) + b"\n"
+    sys.stdout.flush()
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+def write_jsonl(records):
+    """Stream records to stdout as one compact JSON object per line"""
+    sys.stdout.flush()
+    out = sys.stdout.buffer
+    for record in records:
+        out.write(serialization.dumps(record) + b"\n")
+    out.flush()
+
+@cli_handler
 def new_thread(args):
     """Create a new thread entry with input validation"""
-    try:
-        thread_index, index_file = get_thread_index()
-        
+    from uuid import uuid4
+    
+    with _locked_index() as (thread_index, index_file):
         # Validate and sanitize inputs
         if args.tag:
             thread_id = validate_tag(args.tag)
         else:
-            thread_id = str(uuid.uuid4())
+            thread_id = str(uuid4())
         
         if thread_id in thread_index:
             print(f"⚠️  Error: Thread ID '{thread_id}' already exists.")
@@ -192,195 +484,353 @@ def new_thread(args):
             "summary": summary,
             "linked_files": [],
             "chat_url": chat_url,
-            "date_created": datetime.datetime.now().isoformat(),
+            "created_ns": time.time_ns(),
             "auto_generated": not args.tag
         }
         
-        thread_index[thread_id] = entry
-        save_index(thread_index, index_file)
+        record_change(thread_index, index_file, "new", thread_id, **entry)
         print(f"✅ New thread created: {thread_id}")
-        
-    except (ValueError, RuntimeError) as e:
-        print(f"❌ Error: {e}")
-    except Exception as e:
-        print(f"❌ Unexpected error: {e}")
 
+@cli_handler
 def attach_file(args):
     """Attach a file to a thread with security validation"""
-    try:
-        thread_index, index_file = get_thread_index()
-        
-        # Validate thread ID
-        thread_id = validate_tag(args.tag)
+    thread_index, index_file = load_readonly()
+    
+    # Validate thread ID
+    thread_id = validate_tag(args.tag)
+    if thread_id not in thread_index:
+        print(f"❌ Thread ID '{thread_id}' not found.")
+        return
+
+    # Validate and resolve file path
+    resolved_path, file_stat = validate_file_path(args.file, check_exists=True)
+    
+    if file_stat is None:
+        print(f"⚠️  Warning: File '{resolved_path}' does not exist.")
+        response = input("Attach anyway? (y/N): ").strip().lower()
+        if response != 'y':
+            return
+
+    # Reload under the lock; the prompt above must not hold it
+    with _locked_index() as (thread_index, index_file):
         if thread_id not in thread_index:
             print(f"❌ Thread ID '{thread_id}' not found.")
             return
-
-        # Validate and resolve file path
-        resolved_path = validate_file_path(args.file)
         
-        if not Path(resolved_path).exists():
-            print(f"⚠️  Warning: File '{resolved_path}' does not exist.")
-            response = input("Attach anyway? (y/N): ").strip().lower()
-            if response != 'y':
-                return
-
         files = thread_index[thread_id].get("linked_files", [])
         if resolved_path not in files:
-            files.append(resolved_path)
-            thread_index[thread_id]["linked_files"] = files
-            save_index(thread_index, index_file)
+            record_change(thread_index, index_file, "attach", thread_id, file=resolved_path)
             print(f"✅ File '{resolved_path}' attached to thread '{thread_id}'.")
         else:
             print(f"ℹ️  File '{resolved_path}' is already linked to thread '{thread_id}'.")
 
-    except (ValueError, RuntimeError) as e:
-        print(f"❌ Error: {e}")
-    except Exception as e:
-        print(f"❌ Unexpected error: {e}")
-
+@cli_handler
 def show_thread(args):
     """Show thread details with safe output"""
-    try:
-        thread_index, index_file = get_thread_index()
-        
-        thread_id = validate_tag(args.tag)
-        if thread_id in thread_index:
-            # Safe JSON output
-            print(json.dumps(thread_index[thread_id], indent=2, ensure_ascii=False))
-        else:
-            print(f"❌ Thread ID '{thread_id}' not found.")
-            
-    except (ValueError, RuntimeError) as e:
-        print(f"❌ Error: {e}")
-    except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+    thread_index, index_file = load_readonly()
+    
+    thread_id = validate_tag(args.tag)
+    if thread_id in thread_index:
+        # Safe JSON output
+        write_json(export_entry(thread_index[thread_id]))
+    else:
+        print(f"❌ Thread ID '{thread_id}' not found.")
 
+@cli_handler
 def search_threads(args):
     """Search threads by keyword with input validation"""
-    try:
-        thread_index, index_file = get_thread_index()
-        
-        # Sanitize search query
-        query = sanitize_string(args.query, 100).lower()
-        if not query:
-            print("❌ Search query cannot be empty")
-            return
-        
-        results = {}
-        for k, v in thread_index.items():
-            if isinstance(v, dict):
-                summary = v.get("summary", "").lower()
-                if query in k.lower() or query in summary:
-                    results[k] = v
-        
-        if results:
-            print(json.dumps(results, indent=2, ensure_ascii=False))
-        else:
+    thread_index, index_file = load_readonly()
+    
+    # Sanitize search query
+    query = sanitize_string(args.query, 100).lower()
+    if not query:
+        print("❌ Search query cannot be empty")
+        return
+    
+    if not thread_index:
+        if not args.jsonl:
             print("No matching threads found.")
-            
-    except (ValueError, RuntimeError) as e:
-        print(f"❌ Error: {e}")
-    except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+        return
+    
+    # Ranked full-text hits on words and word prefixes come first, followed by
+    # any substring matches they missed, so every baseline match is still found
+    ranked = None
+    index_key = _loaded_key(thread_index)
+    if index_key is not None:
+        from . import search
+        ranked = search.search(get_search_db(index_file), thread_index, index_key, query)
+    ranked = ranked or []
+    seen = set(ranked)
+    matches = itertools.chain(
+        ((k, thread_index[k]) for k in ranked),
+        (
+            (k, v) for k, v in thread_index.items()
+            if k not in seen and isinstance(v, dict)
+            and (query in k.lower() or query in v.get("summary", "").lower())
+        ),
+    )
+    
+    if args.jsonl:
+        write_jsonl({"thread_id": k, **export_entry(v)} for k, v in matches)
+        return
+    
+    results = {k: export_entry(v) for k, v in matches}
+    if results:
+        write_json(results)
+    else:
+        print("No matching threads found.")
 
+@cli_handler
 def reverse_lookup(args):
     """Find thread linked to a file with path validation"""
-    try:
-        thread_index, index_file = get_thread_index()
-        
-        # Validate file path
-        file_path = validate_file_path(args.file)
-        
-        for thread_id, thread_data in thread_index.items():
-            if isinstance(thread_data, dict) and "linked_files" in thread_data:
-                if file_path in thread_data["linked_files"]:
-                    result = {
-                        "thread_id": thread_id,
-                        "summary": thread_data.get("summary", ""),
-                        "chat_url": thread_data.get("chat_url", ""),
-                        "file_path": file_path
-                    }
-                    print(json.dumps(result, indent=2, ensure_ascii=False))
-                    return
-        
-        print(json.dumps({"error": "No thread found for this file."}, indent=2))
-        
-    except (ValueError, RuntimeError) as e:
-        print(f"❌ Error: {e}")
-    except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+    thread_index, index_file = load_readonly()
+    
+    # Validate file path
+    file_path, _ = validate_file_path(args.file)
+    
+    # One indexed lookup in file_index.db, falling back to a scan without SQLite
+    thread_ids = None
+    index_key = _loaded_key(thread_index)
+    if index_key is not None:
+        from . import file_index
+        thread_ids = file_index.lookup(get_file_index_db(index_file), thread_index, index_key, file_path)
+    if thread_ids is not None and len(thread_ids) > 1:
+        # Report threads in index order, whether the mirror was updated or rebuilt
+        linked = set(thread_ids)
+        thread_ids = (k for k in thread_index if k in linked)
+    elif thread_ids is None:
+        thread_ids = (
+            k for k, v in thread_index.items()
+            if isinstance(v, dict) and file_path in v.get("linked_files", ())
+        )
+    
+    # JSONL mode reports every linked thread, the default only the first
+    results = []
+    for thread_id in thread_ids:
+        thread_data = thread_index.get(thread_id)
+        if isinstance(thread_data, dict):
+            results.append({
+                "thread_id": thread_id,
+                "summary": thread_data.get("summary", ""),
+                "chat_url": thread_data.get("chat_url", ""),
+                "file_path": file_path
+            })
+            if not args.jsonl:
+                break
+    
+    if args.jsonl:
+        write_jsonl(results)  # No lines at all when nothing is linked, like search --jsonl
+    elif not results:
+        write_json({"error": "No thread found for this file."})
+    else:
+        write_json(results[0])
+
+def next_thread_id(thread_index, base_id):
+    """Return base_id, or base_id_N with N one past the highest suffix in use"""
+    if base_id not in thread_index:
+        return base_id
+    
+    # One pass over the keys instead of probing base_id_2, base_id_3, ...
+    suffix_re = re.compile(rf"{re.escape(base_id)}(?:_(\d+))?")
+    highest = 1
+    for key in thread_index:
+        if key.startswith(base_id):
+            match = suffix_re.fullmatch(key)
+            if match and match.group(1):
+                highest = max(highest, int(match.group(1)))
+    return f"{base_id}_{highest + 1}"
 
+@cli_handler
 def quick_thread(args):
     """Quickly create a new thread entry with auto-generated tag"""
-    try:
-        thread_index, index_file = get_thread_index()
-        
+    with _locked_index() as (thread_index, index_file):
         # Validate and sanitize inputs
         summary = sanitize_string(args.summary, MAX_SUMMARY_LENGTH)
         if not summary:
             print("❌ Summary cannot be empty")
             return
-            
+        
         chat_url = validate_url(args.chat_url or "")
         
+        # The slug date and date_created come from the same UTC timestamp
+        created_ns = time.time_ns()
         base_slug = slugify(summary)
-        today = datetime.date.today().isoformat()
+        today = format_timestamp_ns(created_ns)[:10]
         thread_id = f"{base_slug}_{today}"
         
         # Handle duplicates
-        i = 1
-        original_id = thread_id
-        while thread_id in thread_index:
-            i += 1
-            thread_id = f"{original_id}_{i}"
+        thread_id = next_thread_id(thread_index, thread_id)
 
         entry = {
             "summary": summary,
             "linked_files": [],
             "chat_url": chat_url,
-            "date_created": datetime.datetime.now().isoformat(),
+            "created_ns": created_ns,
             "auto_generated": True
         }
         
-        thread_index[thread_id] = entry
-        save_index(thread_index, index_file)
+        record_change(thread_index, index_file, "new", thread_id, **entry)
         print(f"✅ Thread created: {thread_id}")
         print(f"Summary: {summary}")
         if chat_url:
             print(f"Chat URL: {chat_url}")
-            
-    except (ValueError, RuntimeError) as e:
-        print(f"❌ Error: {e}")
-    except Exception as e:
-        print(f"❌ Unexpected error: {e}")
 
+@cli_handler
 def detach_file(args):
     """Remove a file from a thread with validation"""
-    try:
-        thread_index, index_file = get_thread_index()
-        
+    with _locked_index() as (thread_index, index_file):
         thread_id = validate_tag(args.tag)
         if thread_id not in thread_index:
             print(f"❌ Thread ID '{thread_id}' not found.")
             return
 
         # Validate file path
-        file_path = validate_file_path(args.file)
+        file_path, _ = validate_file_path(args.file)
         
         files = thread_index[thread_id].get("linked_files", [])
         if file_path in files:
-            files.remove(file_path)
-            thread_index[thread_id]["linked_files"] = files
-            save_index(thread_index, index_file)
+            record_change(thread_index, index_file, "detach", thread_id, file=file_path)
             print(f"✅ File '{file_path}' detached from thread '{thread_id}'.")
         else:
             print(f"❌ File '{file_path}' is not linked to thread '{thread_id}'.")
+
+@cli_handler
+def bulk_attach(args):
+    """Attach files listed as JSON lines on stdin, recording them in a single journal write"""
+    # Validate everything before taking the lock so slow input cannot hold it;
+    # skips are collected as (line number, reason) and reported in input order
+    requests = []
+    skipped = []
+    for line_no, line in enumerate(sys.stdin, 1):
+        if not line.strip():
+            continue
+        try:
+            item = serialization.loads(line)
+            if not (isinstance(item, dict) and isinstance(item.get("tag"), str)
+                    and isinstance(item.get("file"), str)):
+                raise ValueError('expected an object like {"tag": "...", "file": "..."}')
+            thread_id = validate_tag(item["tag"])
+            resolved_path, file_stat = validate_file_path(item["file"], check_exists=True)
+        except ValueError as e:
+            skipped.append((line_no, str(e)))
+            continue
+        
+        if file_stat is None:
+            skipped.append((line_no, f"File '{resolved_path}' does not exist."))
+            continue
+        requests.append((line_no, thread_id, resolved_path))
+    
+    with _locked_index() as (thread_index, index_file):
+        changes = []
+        queued = set()
+        for line_no, thread_id, resolved_path in requests:
+            if thread_id not in thread_index:
+                skipped.append((line_no, f"Thread ID '{thread_id}' not found."))
+                continue
             
-    except (ValueError, RuntimeError) as e:
-        print(f"❌ Error: {e}")
-    except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+            files = thread_index[thread_id].get("linked_files", [])
+            if resolved_path in files or (thread_id, resolved_path) in queued:
+                continue  # Already linked
+            queued.add((thread_id, resolved_path))
+            changes.append(("attach", thread_id, {"file": resolved_path}))
+        
+        if changes:
+            record_changes(thread_index, index_file, changes)
+    
+    for line_no, reason in sorted(skipped):
+        print(f"⚠️  Skipping line {line_no}: {reason}")
+    print(f"✅ Attached {len(changes)} file(s); {len(skipped)} line(s) skipped.")
+
+@cli_handler
+def verify_journal(args):
+    """Check the journal's hash chain for edited, reordered or removed records"""
+    journal_file = get_journal_file(get_index_file())
+    if not journal_file.exists():
+        print("✅ Journal is empty; nothing to verify.")
+        return
+    
+    with _index_lock(journal_file.parent, shared=True):
+        count, bad_line = journal.verify(journal_file)
+    if bad_line is None:
+        print(f"✅ Journal chain intact ({count} records).")
+    else:
+        print(f"❌ Journal chain broken: line {bad_line} does not follow from the record before it.")
+
+def _build_new(subparsers):
+    """New thread command"""
+    parser_new = subparsers.add_parser("new", help="Create a new thread entry")
+    parser_new.add_argument("--tag", help=f"Custom thread tag (max {MAX_TAG_LENGTH} chars)")
+    parser_new.add_argument("--summary", help=f"Short summary of the thread (max {MAX_SUMMARY_LENGTH} chars)")
+    parser_new.add_argument("--chat_url", help="Link to the chat (https URLs only)")
+    parser_new.set_defaults(func=new_thread)
+
+def _build_attach(subparsers):
+    """Attach file command"""
+    parser_attach = subparsers.add_parser("attach", help="Attach a file to a thread")
+    parser_attach.add_argument("tag", help="Thread tag or UUID")
+    parser_attach.add_argument("file", help="Path to the file to attach")
+    parser_attach.set_defaults(func=attach_file)
+
+def _build_detach(subparsers):
+    """Detach file command"""
+    parser_detach = subparsers.add_parser("detach", help="Remove a file from a thread")
+    parser_detach.add_argument("tag", help="Thread tag or UUID")
+    parser_detach.add_argument("file", help="Path to the file to detach")
+    parser_detach.set_defaults(func=detach_file)
+
+def _build_show(subparsers):
+    """Show thread command"""
+    parser_show = subparsers.add_parser("show", help="Show thread details")
+    parser_show.add_argument("tag", help="Thread tag or UUID")
+    parser_show.set_defaults(func=show_thread)
+
+def _build_search(subparsers):
+    """Search threads command"""
+    parser_search = subparsers.add_parser("search", help="Search threads by keyword")
+    parser_search.add_argument("query", help="Keyword to search (max 100 chars)")
+    parser_search.add_argument("--jsonl", action="store_true", help="Stream one JSON object per matching thread")
+    parser_search.set_defaults(func=search_threads)
+
+def _build_reverse(subparsers):
+    """Reverse lookup command"""
+    parser_reverse = subparsers.add_parser("reverse", help="Find thread linked to a file")
+    parser_reverse.add_argument("file", help="Path to the file to look up")
+    parser_reverse.set_defaults(func=reverse_lookup)
+    parser_reverse.add_argument("--json", action="store_true")
+    parser_reverse.add_argument("--jsonl", action="store_true", help="Stream one JSON object per linked thread")
+
+def _build_quick(subparsers):
+    """Quick thread command"""
+    parser_quick = subparsers.add_parser("quick", help="Quickly create a new thread entry with auto-generated tag")
+    parser_quick.add_argument("summary", help=f"Summary of the thread (max {MAX_SUMMARY_LENGTH} chars)")
+    parser_quick.add_argument("chat_url", help="Chat URL (https URLs only)")
+    parser_quick.set_defaults(func=quick_thread)
+
+def _build_bulk_attach(subparsers):
+    """Bulk attach command"""
+    parser_bulk = subparsers.add_parser(
+        "bulk-attach",
+        help='Attach many files from JSON lines on stdin ({"tag": ..., "file": ...} per line)'
+    )
+    parser_bulk.set_defaults(func=bulk_attach)
+
+def _build_verify(subparsers):
+    """Verify journal command"""
+    parser_verify = subparsers.add_parser("verify", help="Check the change journal for tampering")
+    parser_verify.set_defaults(func=verify_journal)
+
+# Subcommand parsers, in the order they are listed in --help
+_BUILDERS = {
+    "new": _build_new,
+    "attach": _build_attach,
+    "detach": _build_detach,
+    "show": _build_show,
+    "search": _build_search,
+    "reverse": _build_reverse,
+    "quick": _build_quick,
+    "bulk-attach": _build_bulk_attach,
+    "verify": _build_verify,
+}
 
 def main():
     """Main entry point for the CLI with error handling"""
@@ -388,46 +838,13 @@ def main():
         parser = argparse.ArgumentParser(description="Threadlink CLI Tool")
         subparsers = parser.add_subparsers()
 
-        # New thread command
-        parser_new = subparsers.add_parser("new", help="Create a new thread entry")
-        parser_new.add_argument("--tag", help=f"Custom thread tag (max {MAX_TAG_LENGTH} chars)")
-        parser_new.add_argument("--summary", help=f"Short summary of the thread (max {MAX_SUMMARY_LENGTH} chars)")
-        parser_new.add_argument("--chat_url", help="Link to the chat (https URLs only)")
-        parser_new.set_defaults(func=new_thread)
-
-        # Attach file command
-        parser_attach = subparsers.add_parser("attach", help="Attach a file to a thread")
-        parser_attach.add_argument("tag", help="Thread tag or UUID")
-        parser_attach.add_argument("file", help="Path to the file to attach")
-        parser_attach.set_defaults(func=attach_file)
-
-        # Detach file command
-        parser_detach = subparsers.add_parser("detach", help="Remove a file from a thread")
-        parser_detach.add_argument("tag", help="Thread tag or UUID")
-        parser_detach.add_argument("file", help="Path to the file to detach")
-        parser_detach.set_defaults(func=detach_file)
-
-        # Show thread command
-        parser_show = subparsers.add_parser("show", help="Show thread details")
-        parser_show.add_argument("tag", help="Thread tag or UUID")
-        parser_show.set_defaults(func=show_thread)
-
-        # Search threads command
-        parser_search = subparsers.add_parser("search", help="Search threads by keyword")
-        parser_search.add_argument("query", help="Keyword to search (max 100 chars)")
-        parser_search.set_defaults(func=search_threads)
-
-        # Reverse lookup command
-        parser_reverse = subparsers.add_parser("reverse", help="Find thread linked to a file")
-        parser_reverse.add_argument("file", help="Path to the file to look up")
-        parser_reverse.set_defaults(func=reverse_lookup)
-        parser_reverse.add_argument("--json", action="store_true")
-
-        # Quick thread command
-        parser_quick = subparsers.add_parser("quick", help="Quickly create a new thread entry with auto-generated tag")
-        parser_quick.add_argument("summary", help=f"Summary of the thread (max {MAX_SUMMARY_LENGTH} chars)")
-        parser_quick.add_argument("chat_url", help="Chat URL (https URLs only)")
-        parser_quick.set_defaults(func=quick_thread)
+        # Only build the subcommand being run; the full set is needed for help and errors
+        command = sys.argv[1] if len(sys.argv) > 1 else None
+        if command in _BUILDERS:
+            _BUILDERS[command](subparsers)
+        else:
+            for build in _BUILDERS.values():
+                build(subparsers)
 
         # Parse and execute
         args = parser.parse_args()
@@ -0,0 +1,64 @@
+"""SQLite index from linked file paths to the threads that link them
+
+file_index.db is a fingerprinted mirror of the JSON index (see mirror.py).
+"""
+
+import sqlite3
+
+from . import mirror
+
+# The UNIQUE constraint doubles as the index that lookups use
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS links "
+    "(file TEXT NOT NULL, thread_id TEXT NOT NULL, UNIQUE (file, thread_id))",
+)
+
+_INSERT_LINK = "INSERT OR IGNORE INTO links (file, thread_id) VALUES (?, ?)"
+
+
+def lookup(db_file, thread_index, fingerprint, file_path):
+    """Return the IDs of threads linking file_path, unordered, or None if file_index.db cannot be used"""
+    conn = mirror.open_current(db_file, fingerprint)
+    if conn is None:
+        return None
+
+    try:
+        rows = conn.execute("SELECT thread_id FROM links WHERE file = ?", (file_path,)).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+    return [row[0] for row in rows if row[0] in thread_index]
+
+
+def record_changes(db_file, thread_index, old_fingerprint, new_fingerprint, changes):
+    """Carry (op, thread_id, fields) changes into file_index.db, rebuilding it if it was stale"""
+
+    def update(conn):
+        for op, thread_id, fields in changes:
+            if op == "attach":
+                conn.execute(_INSERT_LINK, (fields["file"], thread_id))
+            elif op == "detach":
+                conn.execute(
+                    "DELETE FROM links WHERE file = ? AND thread_id = ?", (fields["file"], thread_id)
+                )
+            elif op == "new":
+                conn.executemany(
+                    _INSERT_LINK,
+                    ((file_path, thread_id) for file_path in fields.get("linked_files") or ()),
+                )
+
+    def rebuild(conn):
+        conn.execute("DELETE FROM links")
+        conn.executemany(
+            _INSERT_LINK,
+            (
+                (file_path, thread_id)
+                for thread_id, data in thread_index.items()
+                if isinstance(data, dict)
+                for file_path in data.get("linked_files") or ()
+            ),
+        )
+
+    mirror.sync(db_file, _SCHEMA, old_fingerprint, new_fingerprint, update, rebuild)
@@ -0,0 +1,156 @@
+"""Append-only journal of thread index changes
+
+Each record carries the digest of the record before it ("prev"), chained as
+BLAKE2b-256(prev || record bytes), so any edit, reordering or removal inside the
+journal is detectable with verify().
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from . import serialization
+
+# Flags for single-writer atomic appends (O_BINARY keeps Windows from translating newlines).
+# The descriptor is readable so append() can check the journal ends on a record boundary.
+APPEND_FLAGS = os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+
+# "prev" of the first record in a journal
+GENESIS = "0" * 64
+
+
+def chain(prev, body):
+    """Return the digest linking a record's canonical bytes to its predecessor"""
+    return hashlib.blake2b(bytes.fromhex(prev) + body, digest_size=32).hexdigest()
+
+
+def _last_boundary(fd, size):
+    """Return the offset just past the journal's last newline, or 0 if it has none"""
+    end = size
+    while end > 0:
+        start = max(0, end - 4096)
+        os.lseek(fd, start, os.SEEK_SET)
+        newline = os.read(fd, end - start).rfind(b"\n")
+        if newline != -1:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+def append(journal_file, records, prev=GENESIS):
+    """Append records chained onto prev in one write; return (journal size in bytes, head digest)"""
+    lines = []
+    for record in records:
+        # Sorted keys and compact separators make the bytes canonical for hashing
+        body = serialization.dumps(dict(record, prev=prev, ts=time.time_ns()), sort_keys=True)
+        prev = chain(prev, body)
+        lines.append(body + b"\n")
+    data = b"".join(lines)
+
+    fd = os.open(journal_file, APPEND_FLAGS, 0o600)
+    try:
+        # Drop a record torn by a crash; replay() never applied it, and writers
+        # hold the exclusive lock so it cannot be an append still in progress
+        size = os.fstat(fd).st_size
+        if size:
+            os.lseek(fd, -1, os.SEEK_END)
+            if os.read(fd, 1) != b"\n":
+                os.ftruncate(fd, _last_boundary(fd, size))
+        written = os.write(fd, data)
+        if written != len(data):
+            raise OSError(f"Short write to journal ({written} of {len(data)} bytes)")
+        os.fsync(fd)
+        return os.fstat(fd).st_size, prev
+    finally:
+        os.close(fd)
+
+
+def apply(thread_index, record):
+    """Apply a single journal record to an in-memory thread index"""
+    op = record.get("op")
+    thread_id = record.get("thread_id")
+    fields = record.get("fields") or {}
+
+    if op == "new":
+        thread = dict(fields)
+        thread["linked_files"] = set(thread.get("linked_files") or ())
+        thread_index[thread_id] = thread
+        return
+
+    thread = thread_index.get(thread_id)
+    if not isinstance(thread, dict):
+        return
+
+    # linked_files is a set in memory; attach/detach are idempotent so replaying
+    # over a fresh snapshot is safe
+    files = thread.get("linked_files")
+    if not isinstance(files, set):
+        files = thread["linked_files"] = set(files or ())
+    if op == "attach":
+        files.add(fields["file"])
+    elif op == "detach":
+        files.discard(fields["file"])
+    else:
+        raise ValueError(f"Unknown journal operation: {op}")
+
+
+def _records(journal_file):
+    """Yield (line number, canonical bytes, record or None) for each journal line"""
+    with open(journal_file, "rb") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.endswith(b"\n"):
+                break  # Unterminated tail torn by a crash; the next append() cuts it off
+            body = line[:-1]
+            if not body.strip():
+                continue
+            try:
+                record = serialization.loads(body)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                record = None
+            yield line_no, body, record if isinstance(record, dict) else None
+
+
+def replay(journal_file, thread_index):
+    """Replay every journal record onto thread_index and return the chain head digest
+
+    Raises ValueError at the first unreadable record; the records before it
+    have already been applied to thread_index by then.
+    """
+    last = None
+    for line_no, body, record in _records(journal_file):
+        # Torn tails are cut off before the next append, so a bad record here is corruption
+        try:
+            apply(thread_index, record)
+        except (KeyError, ValueError, TypeError, AttributeError):
+            raise ValueError(f"Unreadable journal record at line {line_no}")
+        last = (record.get("prev", GENESIS), body)
+
+    # Only the newest record needs hashing to extend the chain
+    if last is None:
+        return GENESIS
+    try:
+        return chain(*last)
+    except (ValueError, TypeError):
+        return GENESIS  # Malformed prev; verify() reports where the chain breaks
+
+
+def verify(journal_file):
+    """Walk the whole chain; return (records checked, first bad line number or None)"""
+    head = GENESIS
+    count = 0
+    for line_no, body, record in _records(journal_file):
+        if record is None or record.get("prev") != head:
+            return count, line_no
+        head = chain(head, body)
+        count += 1
+    return count, None
+
+
+def truncate(journal_file):
+    """Empty the journal once its records are captured in a snapshot"""
+    fd = os.open(journal_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
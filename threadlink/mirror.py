@@ -0,0 +1,71 @@
+"""Fingerprinted SQLite mirrors of the thread index
+
+The JSON index stays the source of truth. Each mirror database records the
+fingerprint of the index state it reflects: writers bring it up to date while
+they hold the index lock, and readers open it read-only and only trust it
+while that fingerprint still matches.
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+
+def _get_fingerprint(conn):
+    row = conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+    return row[0] if row else None
+
+
+def open_current(db_file, fingerprint):
+    """Open db_file read-only inside a read transaction if it mirrors fingerprint
+
+    Returns None when the mirror is missing, stale or unreadable, in which
+    case the caller falls back to scanning the thread index itself.
+    """
+    if fingerprint is None:
+        return None
+    try:
+        conn = sqlite3.connect(Path(db_file).as_uri() + "?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None
+
+    try:
+        # One read transaction, so the rows queried next match the fingerprint checked here
+        conn.execute("BEGIN")
+        if _get_fingerprint(conn) == repr(fingerprint):
+            return conn
+    except sqlite3.Error:
+        pass
+    conn.close()
+    return None
+
+
+def sync(db_file, schema, old_fingerprint, new_fingerprint, update, rebuild):
+    """Bring db_file to new_fingerprint; only called by writers holding the index lock
+
+    update(conn) carries just the latest changes into a mirror that was at
+    old_fingerprint; anything else is repopulated from scratch by rebuild(conn).
+    """
+    try:
+        conn = sqlite3.connect(str(db_file))
+    except sqlite3.Error:
+        return
+
+    try:
+        os.chmod(db_file, 0o600)
+        with conn:
+            for statement in schema:
+                conn.execute(statement)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            if _get_fingerprint(conn) == repr(old_fingerprint):
+                update(conn)
+            else:
+                rebuild(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)",
+                (repr(new_fingerprint),),
+            )
+    except (sqlite3.Error, OSError):
+        pass
+    finally:
+        conn.close()
@@ -0,0 +1,71 @@
+"""SQLite FTS5 search index over thread summaries and tags
+
+search.db is a fingerprinted mirror of the JSON index (see mirror.py).
+"""
+
+import re
+import sqlite3
+
+from . import mirror
+
+# Query words become quoted prefix terms, which also neutralizes FTS5 syntax
+_QUERY_WORD_RE = re.compile(r'\w+')
+
+_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS threads_fts "
+    "USING fts5(thread_id, summary, tokenize='porter unicode61')",
+)
+
+
+def build_match(query):
+    """Turn free text into an FTS5 MATCH expression, or None if it has no words"""
+    words = _QUERY_WORD_RE.findall(query)
+    if not words:
+        return None
+    return " ".join('"{}"*'.format(word) for word in words)
+
+
+def search(db_file, thread_index, fingerprint, query):
+    """Return matching thread IDs best-first, or None if search.db cannot be used"""
+    match = build_match(query)
+    if match is None:
+        return None
+
+    conn = mirror.open_current(db_file, fingerprint)
+    if conn is None:
+        return None
+
+    try:
+        rows = conn.execute(
+            "SELECT thread_id FROM threads_fts WHERE threads_fts MATCH ? ORDER BY rank", (match,)
+        ).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+    return [row[0] for row in rows if row[0] in thread_index]
+
+
+def record_changes(db_file, thread_index, old_fingerprint, new_fingerprint, changes):
+    """Carry (op, thread_id, fields) changes into search.db, rebuilding it if it was stale"""
+
+    def update(conn):
+        # Only new threads add searchable text; attach/detach just advance the fingerprint
+        conn.executemany(
+            "INSERT INTO threads_fts (thread_id, summary) VALUES (?, ?)",
+            ((thread_id, fields.get("summary", "")) for op, thread_id, fields in changes if op == "new"),
+        )
+
+    def rebuild(conn):
+        conn.execute("DELETE FROM threads_fts")
+        conn.executemany(
+            "INSERT INTO threads_fts (thread_id, summary) VALUES (?, ?)",
+            (
+                (thread_id, data.get("summary", ""))
+                for thread_id, data in thread_index.items()
+                if isinstance(data, dict)
+            ),
+        )
+
+    mirror.sync(db_file, _SCHEMA, old_fingerprint, new_fingerprint, update, rebuild)
@@ -0,0 +1,51 @@
+"""JSON encoding helpers that use orjson when it is installed"""
+
+import json
+import mmap
+
+try:
+    import orjson
+except ImportError:  # Optional speedup: pip install threadlink[fast]
+    orjson = None
+
+
+def loads(data):
+    """Parse JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_file(path):
+    """Parse a JSON file, memory-mapping it so orjson can read it without a copy"""
+    with open(path, "rb") as f:
+        if orjson is not None:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                mm = None  # Empty file or mmap unsupported; read it normally
+            if mm is not None:
+                with mm:
+                    if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    with memoryview(mm) as view:
+                        return orjson.loads(view)
+        # The stdlib parser needs bytes, so mapping the file would only add a copy
+        return loads(f.read())
+
+
+def dumps(obj, indent=False, sort_keys=False):
+    """Serialize obj to UTF-8 JSON bytes, compact unless indent is set"""
+    if orjson is not None:
+        option = 0
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option)
+
+    if indent:
+        text = json.dumps(obj, indent=2, sort_keys=sort_keys, ensure_ascii=False)
+    else:
+        text = json.dumps(obj, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False)
+    return text.encode('utf-8')